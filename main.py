@@ -4,8 +4,16 @@
 
 from fastmcp import FastMCP          # FastMCP framework to create MCP server
 import os                            # For file path handling
+import json                          # For the default categories resource
+import math                          # To reject NaN / infinite amounts
+import asyncio                       # Locks and queues for the connection pool
+import pathlib                       # To build the read-only database URI
 import aiosqlite                     # Async SQLite for non-blocking DB operations
 import tempfile                      # To get system temporary directory
+import time                          # Timestamps for the summary cache TTL
+from collections import OrderedDict  # LRU order for the summary cache
+from contextlib import asynccontextmanager  # For the server lifespan hook
+from starlette.responses import Response    # Raw HTTP response for /categories
 
 
 # ---------------------------------------------------------
@@ -24,13 +32,368 @@ CATEGORIES_PATH = os.path.join(os.path.dirname(__file__), "categories.json")
 print(f"Database path: {DB_PATH}")
 
 
+# ---------------------------------------------------------
+# Connection Tuning
+# ---------------------------------------------------------
+# PRAGMAs applied to every connection we open (apart from
+# journal_mode, these settings are per-connection):
+# - synchronous=NORMAL: safe with WAL, far fewer fsyncs
+# - cache_size: 64 MB page cache
+# - temp_store=MEMORY: GROUP BY / sort temp data in memory
+# - mmap_size: 256 MB memory-mapped reads
+# - wal_autocheckpoint: checkpoint every 1000 WAL pages
+# ---------------------------------------------------------
+
+DB_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-65536",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA wal_autocheckpoint=1000",
+)
+
+
+# ---------------------------------------------------------
+# Database Connection Pool
+# ---------------------------------------------------------
+# Long-lived aiosqlite connections are reused by every tool
+# instead of opening a new connection (and a new thread) on
+# each MCP call:
+# - 1 read-write connection for inserts
+# - N read-only connections for queries (N = CPU count)
+#
+# Each aiosqlite connection runs on its own thread, so read
+# tools can execute concurrently on separate readers.
+# SQLite only allows one writer at a time, so the writer is
+# guarded by a lock.
+#
+# Connections are opened lazily on first use and closed
+# when the server shuts down.
+# ---------------------------------------------------------
+
+def dict_row(cursor, row):
+    """sqlite3 row factory that returns each row as a dict."""
+    return {col[0]: value for col, value in zip(cursor.description, row)}
+
+
+class SqlitePool:
+    """One writer plus a bounded queue of read-only connections."""
+
+    def __init__(self, path, readers=None):
+        self.path = path
+        self.size = readers or os.cpu_count() or 1
+
+        self._writer = None
+        self._readers = asyncio.Queue()
+        self._connections = []
+
+        self._open_lock = asyncio.Lock()
+        self._write_lock = asyncio.Lock()
+
+    async def _open(self):
+        """Open the writer and all readers (only once)."""
+        async with self._open_lock:
+            # Another call may have opened the pool while we were waiting
+            if self._writer is not None:
+                return
+
+            # Build everything locally and publish only once all
+            # connections are open, so a failure leaves nothing behind
+            opened = []
+            readers = []
+
+            try:
+                # Read-write connection
+                writer = await aiosqlite.connect(self.path)
+                opened.append(writer)
+                await writer.execute("PRAGMA journal_mode=WAL")
+                for pragma in DB_PRAGMAS:
+                    await writer.execute(pragma)
+
+                # Read-only connections
+                ro_uri = pathlib.Path(self.path).as_uri() + "?mode=ro"
+                for _ in range(self.size):
+                    reader = await aiosqlite.connect(ro_uri, uri=True)
+                    opened.append(reader)
+                    await reader.execute("PRAGMA query_only=1")
+
+                    # Rows come back as dicts, built on the connection's thread
+                    reader.row_factory = dict_row
+                    for pragma in DB_PRAGMAS:
+                        await reader.execute(pragma)
+                    readers.append(reader)
+
+            except Exception:
+                for conn in opened:
+                    await conn.close()
+                raise
+
+            self._connections = opened
+            for reader in readers:
+                self._readers.put_nowait(reader)
+            self._writer = writer
+
+    @asynccontextmanager
+    async def reader(self):
+        """Borrow a read-only connection for the duration of the block."""
+        if self._writer is None:
+            await self._open()
+
+        conn = await self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put_nowait(conn)
+
+    @asynccontextmanager
+    async def writer(self):
+        """Hold the single read-write connection for the duration of the block."""
+        if self._writer is None:
+            await self._open()
+
+        async with self._write_lock:
+            yield self._writer
+
+    async def close(self):
+        """Close every connection in the pool."""
+        async with self._open_lock:
+            for conn in self._connections:
+                await conn.close()
+
+            self._connections = []
+            self._readers = asyncio.Queue()
+            self._writer = None
+
+
+pool = SqlitePool(DB_PATH)
+
+
+# ---------------------------------------------------------
+# Summary Cache
+# ---------------------------------------------------------
+# summarize() only depends on its arguments and the data in
+# the database, and clients often ask for the same windows
+# again (e.g. "this month", "this month, food").
+#
+# _DB_VERSION is bumped after every committed insert batch.
+# Cached results are tagged with the version they were read
+# at and ignored once the version moves on.
+#
+# _DB_VERSION only sees this process's inserts, so entries
+# also expire after SUMMARY_CACHE_TTL seconds; writes from
+# another process (or a manual sqlite3 session) show up
+# after at most that long.
+#
+# The cache keeps at most SUMMARY_CACHE_SIZE entries (least
+# recently used entries are evicted first).
+# ---------------------------------------------------------
+
+SUMMARY_CACHE_SIZE = 256
+SUMMARY_CACHE_TTL = 5.0   # seconds
+
+_DB_VERSION = 0
+_SUMMARY_CACHE = OrderedDict()
+
+
+def _summary_cache_get(key):
+    """Return cached summarize() rows for key, or None if missing or stale."""
+    entry = _SUMMARY_CACHE.get(key)
+    if entry is None:
+        return None
+
+    version, stored_at, rows = entry
+    if version != _DB_VERSION or time.monotonic() - stored_at > SUMMARY_CACHE_TTL:
+        del _SUMMARY_CACHE[key]
+        return None
+
+    _SUMMARY_CACHE.move_to_end(key)
+    return rows
+
+
+def _summary_cache_put(key, version, rows):
+    """Store summarize() rows read at the given database version."""
+    # Data changed while the query ran: don't cache an outdated result
+    if version != _DB_VERSION:
+        return
+
+    _SUMMARY_CACHE[key] = (version, time.monotonic(), rows)
+    _SUMMARY_CACHE.move_to_end(key)
+
+    while len(_SUMMARY_CACHE) > SUMMARY_CACHE_SIZE:
+        _SUMMARY_CACHE.popitem(last=False)
+
+
+# ---------------------------------------------------------
+# Batched Inserts
+# ---------------------------------------------------------
+# Every commit is an fsync, so committing once per expense
+# becomes the main cost under concurrent clients.
+#
+# add_expense puts its row on a queue and waits; a single
+# background flusher collects up to ASYNC_INSERT_MAX_ROWS
+# rows (or whatever arrives within ASYNC_INSERT_WAIT_TIME
+# seconds), writes them with one executemany() and one
+# commit, then hands each caller its row id.
+# ---------------------------------------------------------
+
+ASYNC_INSERT_MAX_ROWS = 500
+ASYNC_INSERT_WAIT_TIME = 0.05   # seconds
+
+INSERT_EXPENSE_SQL = """
+    INSERT INTO expenses(date, amount, category, subcategory, note)
+    VALUES (?,?,?,?,?)
+"""
+
+
+class InsertBatcher:
+    """Coalesce concurrent expense inserts into one INSERT + commit."""
+
+    def __init__(self, pool, max_rows=ASYNC_INSERT_MAX_ROWS, wait_time=ASYNC_INSERT_WAIT_TIME):
+        self.pool = pool
+        self.max_rows = max_rows
+        self.wait_time = wait_time
+
+        self._queue = asyncio.Queue()
+        self._task = None
+
+    async def add(self, row):
+        """Queue one (date, amount, category, subcategory, note) row and return its id."""
+        # Start the flusher on first use (needs a running event loop)
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+        fut = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((row, fut))
+
+        return await fut
+
+    async def _run(self):
+        """Background loop: collect a batch, flush it, repeat."""
+        loop = asyncio.get_running_loop()
+
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                return
+
+            batch = [item]
+            deadline = loop.time() + self.wait_time
+            stopping = False
+
+            # Keep collecting until the batch is full or the wait time runs out
+            while len(batch) < self.max_rows:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+
+                if item is None:
+                    stopping = True
+                    break
+
+                batch.append(item)
+
+            await self._flush(batch)
+
+            if stopping:
+                return
+
+    async def _flush(self, batch):
+        """Write one batch with a single executemany() and commit."""
+        global _DB_VERSION
+
+        n = len(batch)
+        rows = [row for row, _ in batch]
+
+        try:
+            async with self.pool.writer() as c:
+                try:
+                    # One prepared statement, bound once per row in C
+                    await c.executemany(INSERT_EXPENSE_SQL, rows)
+
+                    # executemany() does not update lastrowid, so ask SQLite
+                    # before committing (still inside the same transaction)
+                    cur = await c.execute("SELECT last_insert_rowid()")
+                    (last_id,) = await cur.fetchone()
+
+                    await c.commit()
+
+                    # Single writer: the batch got consecutive ids ending at last_id
+                    results = [(last_id - (n - 1 - i), None) for i in range(n)]
+
+                except Exception:
+                    # Don't leave a partial batch for the next commit
+                    await c.rollback()
+
+                    # Retry row by row so only the bad rows fail
+                    results = await self._insert_each(c, rows)
+
+                # Invalidate cached summaries
+                _DB_VERSION += 1
+
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+
+        for (_, fut), (expense_id, error) in zip(batch, results):
+            if fut.done():
+                continue
+
+            if error is not None:
+                fut.set_exception(error)
+            else:
+                fut.set_result(expense_id)
+
+    async def _insert_each(self, c, rows):
+        """Insert and commit rows one at a time; return (id, error) per row."""
+        results = []
+
+        for row in rows:
+            try:
+                cur = await c.execute(INSERT_EXPENSE_SQL, row)
+                await c.commit()
+                results.append((cur.lastrowid, None))
+
+            except Exception as e:
+                await c.rollback()
+                results.append((None, e))
+
+        return results
+
+    async def close(self):
+        """Flush anything still queued and stop the background flusher."""
+        if self._task is not None:
+            self._queue.put_nowait(None)
+            await self._task
+            self._task = None
+
+
+batcher = InsertBatcher(pool)
+
+
+@asynccontextmanager
+async def lifespan(server):
+    """Flush pending inserts and close the connection pool when the server stops."""
+    try:
+        yield
+    finally:
+        await batcher.close()
+        await pool.close()
+
+
 # ---------------------------------------------------------
 # Create the MCP Server
 # ---------------------------------------------------------
 # "ExpenseTracker" is the name shown to MCP clients
 # ---------------------------------------------------------
 
-mcp = FastMCP("ExpenseTracker")
+mcp = FastMCP("ExpenseTracker", lifespan=lifespan)
 
 
 # ---------------------------------------------------------
@@ -38,8 +401,9 @@ mcp = FastMCP("ExpenseTracker")
 # ---------------------------------------------------------
 # This function:
 # 1. Creates the database table if not present
-# 2. Enables WAL mode for better concurrency
-# 3. Tests write access to avoid runtime failures
+# 2. Enables WAL mode (and connection tuning) for better concurrency
+# 3. Creates indexes used by the read tools
+# 4. Tests write access to avoid runtime failures
 # ---------------------------------------------------------
 
 def init_db():
@@ -51,6 +415,10 @@ def init_db():
             # Enable Write-Ahead Logging (better concurrency)
             c.execute("PRAGMA journal_mode=WAL")
 
+            # Same tuning as the pooled connections
+            for pragma in DB_PRAGMAS:
+                c.execute(pragma)
+
             # Create expenses table
             c.execute("""
                 CREATE TABLE IF NOT EXISTS expenses(
@@ -63,6 +431,19 @@ def init_db():
                 )
             """)
 
+            # Covering index for summarize: range scan on date,
+            # category/amount read straight from the index
+            c.execute("""
+                CREATE INDEX IF NOT EXISTS idx_expenses_date_cat
+                ON expenses(date, category, amount)
+            """)
+
+            # Matches list_expenses ORDER BY, so no sort step is needed
+            c.execute("""
+                CREATE INDEX IF NOT EXISTS idx_expenses_date
+                ON expenses(date DESC, id DESC)
+            """)
+
             # Insert and delete a test row to confirm write access
             c.execute(
                 "INSERT OR IGNORE INTO expenses(date, amount, category) VALUES ('2000-01-01', 0, 'test')"
@@ -89,30 +470,81 @@ init_db()
 # ---------------------------------------------------------
 # Adds a new expense record to the database
 # This function is async to avoid blocking the MCP server
+#
+# Inputs are checked before they are queued, so malformed
+# values get a clear error instead of failing inside SQLite
+# (which also forces its batch onto the slow row-by-row path).
 # ---------------------------------------------------------
 
+# SQLite INTEGER range (larger Python ints cannot be bound)
+_SQLITE_INT_MIN = -2**63
+_SQLITE_INT_MAX = 2**63 - 1
+
+
+def _validate_expense(date, amount, category, subcategory, note):
+    """Return an error dict for invalid expense fields, or None if they look fine."""
+    if not (isinstance(date, str) and len(date) == 10 and date[4] == "-" and date[7] == "-"):
+        return {
+            "status": "error",
+            "message": "Invalid date: expected YYYY-MM-DD."
+        }
+
+    if isinstance(amount, bool) or not isinstance(amount, (int, float)):
+        return {
+            "status": "error",
+            "message": "Invalid amount: expected a number."
+        }
+
+    # NaN would be stored as NULL and break the NOT NULL constraint
+    if isinstance(amount, float) and not math.isfinite(amount):
+        return {
+            "status": "error",
+            "message": "Invalid amount: expected a finite number."
+        }
+
+    if isinstance(amount, int) and not _SQLITE_INT_MIN <= amount <= _SQLITE_INT_MAX:
+        return {
+            "status": "error",
+            "message": "Invalid amount: number is too large."
+        }
+
+    if not (isinstance(category, str) and category):
+        return {
+            "status": "error",
+            "message": "Invalid category: expected a non-empty string."
+        }
+
+    if not isinstance(subcategory, str):
+        return {
+            "status": "error",
+            "message": "Invalid subcategory: expected a string."
+        }
+
+    if not isinstance(note, str):
+        return {
+            "status": "error",
+            "message": "Invalid note: expected a string."
+        }
+
+    return None
+
+
 @mcp.tool()
 async def add_expense(date, amount, category, subcategory="", note=""):
     """Add a new expense entry to the database."""
-    try:
-        async with aiosqlite.connect(DB_PATH) as c:
-            # Insert expense into database
-            cur = await c.execute(
-                """
-                INSERT INTO expenses(date, amount, category, subcategory, note)
-                VALUES (?,?,?,?,?)
-                """,
-                (date, amount, category, subcategory, note)
-            )
+    error = _validate_expense(date, amount, category, subcategory, note)
+    if error is not None:
+        return error
 
-            # Save changes
-            await c.commit()
+    try:
+        # Queue the row; it is inserted and committed with its batch
+        expense_id = await batcher.add((date, amount, category, subcategory, note))
 
-            return {
-                "status": "success",
-                "id": cur.lastrowid,
-                "message": "Expense added successfully"
-            }
+        return {
+            "status": "success",
+            "id": expense_id,
+            "message": "Expense added successfully"
+        }
 
     except Exception as e:
         # Handle read-only database error explicitly
@@ -133,25 +565,38 @@ async def add_expense(date, amount, category, subcategory="", note=""):
 # ---------------------------------------------------------
 # Fetches all expenses within a given date range
 # Results are ordered by newest first
+#
+# Rows are fetched LIST_FETCH_SIZE at a time into a single
+# result list, so long ranges never hold a second full copy
+# of the result and the event loop gets a turn between pages.
 # ---------------------------------------------------------
 
+LIST_FETCH_SIZE = 1000
+
+# Ordered by date (not just id) so back-dated expenses sort correctly;
+# idx_expenses_date matches this ORDER BY, so SQLite reads the index
+# in order and never sorts
+LIST_EXPENSES_SQL = """
+    SELECT id, date, amount, category, subcategory, note
+    FROM expenses
+    WHERE date BETWEEN ? AND ?
+    ORDER BY date DESC, id DESC
+"""
+
+
 @mcp.tool()
 async def list_expenses(start_date, end_date):
     """List expense entries within an inclusive date range."""
     try:
-        async with aiosqlite.connect(DB_PATH) as c:
-            cur = await c.execute("""
-                SELECT id, date, amount, category, subcategory, note
-                FROM expenses
-                WHERE date BETWEEN ? AND ?
-                ORDER BY date DESC, id DESC
-            """, (start_date, end_date))
+        async with pool.reader() as c:
+            cur = await c.execute(LIST_EXPENSES_SQL, (start_date, end_date))
 
-            # Convert rows into list of dictionaries
-            cols = [d[0] for d in cur.description]
-            rows = await cur.fetchall()
+            # Reader rows are already dictionaries
+            result = []
+            while chunk := await cur.fetchmany(LIST_FETCH_SIZE):
+                result.extend(chunk)
 
-            return [dict(zip(cols, r)) for r in rows]
+        return result
 
     except Exception as e:
         return {
@@ -166,36 +611,62 @@ async def list_expenses(start_date, end_date):
 # Groups expenses by category and calculates:
 # - Total amount
 # - Number of transactions
+#
+# The two query variants are fixed strings (chosen by a branch
+# rather than built by concatenation) so each connection's
+# statement cache keeps reusing the same prepared statements.
 # ---------------------------------------------------------
 
+SUMMARIZE_SQL_ALL = """
+    SELECT category,
+           SUM(amount) AS total_amount,
+           COUNT(*) AS count
+    FROM expenses
+    WHERE date BETWEEN ? AND ?
+    GROUP BY category
+    ORDER BY total_amount DESC
+"""
+
+SUMMARIZE_SQL_CAT = """
+    SELECT category,
+           SUM(amount) AS total_amount,
+           COUNT(*) AS count
+    FROM expenses
+    WHERE date BETWEEN ? AND ? AND category = ?
+    GROUP BY category
+    ORDER BY total_amount DESC
+"""
+
+
 @mcp.tool()
 async def summarize(start_date, end_date, category=None):
     """Summarize expenses by category within an inclusive date range."""
     try:
-        async with aiosqlite.connect(DB_PATH) as c:
-            query = """
-                SELECT category,
-                       SUM(amount) AS total_amount,
-                       COUNT(*) AS count
-                FROM expenses
-                WHERE date BETWEEN ? AND ?
-            """
-            params = [start_date, end_date]
-
-            # Optional category filter
-            if category:
-                query += " AND category = ?"
-                params.append(category)
-
-            query += " GROUP BY category ORDER BY total_amount DESC"
-
+        # Serve repeated requests from the cache
+        key = (start_date, end_date, category or None)
+        cached = _summary_cache_get(key)
+        if cached is not None:
+            return cached
+
+        version = _DB_VERSION
+
+        # Optional category filter
+        if category:
+            query = SUMMARIZE_SQL_CAT
+            params = (start_date, end_date, category)
+        else:
+            query = SUMMARIZE_SQL_ALL
+            params = (start_date, end_date)
+
+        async with pool.reader() as c:
             cur = await c.execute(query, params)
 
-            # Convert results to JSON-friendly format
-            cols = [d[0] for d in cur.description]
-            rows = await cur.fetchall()
+            # Reader rows are already dictionaries
+            result = await cur.fetchall()
+
+        _summary_cache_put(key, version, result)
 
-            return [dict(zip(cols, r)) for r in rows]
+        return result
 
     except Exception as e:
         return {
@@ -209,14 +680,17 @@ async def summarize(start_date, end_date, category=None):
 # ---------------------------------------------------------
 # Exposes categories as a read-only JSON resource
 # Accessible via: expense:///categories
+#
+# The categories file does not change while the server is
+# running, so it is read once (at import time) and served
+# from memory on every request. Only a successful read is
+# cached: if the file can't be read, the error is returned
+# and the read is retried on the next request.
 # ---------------------------------------------------------
 
-@mcp.resource("expense:///categories", mime_type="application/json")
-def categories():
-    """Return expense categories as a JSON resource."""
-    
-    # Default categories if file does not exist
-    default_categories = {
+# Default categories if file does not exist (serialized once)
+_DEFAULT_CATEGORIES_JSON = json.dumps(
+    {
         "categories": [
             "Food & Dining",
             "Transportation",
@@ -229,8 +703,13 @@ def categories():
             "Business",
             "Other"
         ]
-    }
+    },
+    indent=2
+)
 
+
+def _load_categories():
+    """Read the categories JSON (or the defaults) as a string."""
     try:
         # Try loading categories from file
         with open(CATEGORIES_PATH, "r", encoding="utf-8") as f:
@@ -238,11 +717,57 @@ def categories():
 
     except FileNotFoundError:
         # If file is missing, return default categories
-        import json
-        return json.dumps(default_categories, indent=2)
+        return _DEFAULT_CATEGORIES_JSON
 
-    except Exception as e:
-        return f'{{"error": "Could not load categories: {str(e)}"}}'
+
+_CATEGORIES_BODY = None
+_CATEGORIES_BYTES = None
+
+
+def _get_categories():
+    """Return the categories JSON as (str, bytes), loading it until a read succeeds."""
+    global _CATEGORIES_BODY, _CATEGORIES_BYTES
+
+    if _CATEGORIES_BODY is None:
+        try:
+            body = _load_categories()
+
+        except Exception as e:
+            # Don't cache read errors; try again on the next request
+            error = f'{{"error": "Could not load categories: {str(e)}"}}'
+            return error, error.encode("utf-8")
+
+        _CATEGORIES_BODY = body
+        _CATEGORIES_BYTES = body.encode("utf-8")
+
+    return _CATEGORIES_BODY, _CATEGORIES_BYTES
+
+
+# Load once at startup
+_get_categories()
+
+
+@mcp.resource("expense:///categories", mime_type="application/json")
+def categories():
+    """Return expense categories as a JSON resource."""
+    # Kept as str: returning bytes would make FastMCP send a base64 blob
+    body, _ = _get_categories()
+    return body
+
+
+# ---------------------------------------------------------
+# HTTP Route: Expense Categories
+# ---------------------------------------------------------
+# Plain GET /categories for HTTP clients that just want the
+# JSON. The body is encoded once when it is loaded and sent
+# as-is, with no per-request encoding or MCP envelope.
+# ---------------------------------------------------------
+
+@mcp.custom_route("/categories", methods=["GET"])
+async def categories_http(request):
+    """Return expense categories as raw JSON over HTTP."""
+    _, body = _get_categories()
+    return Response(content=body, media_type="application/json")
 
 
 # ---------------------------------------------------------